@@ -22,8 +22,9 @@ Usage:
     6. Output will be saved in the 'output' directory.
 
 Notes:
-    - Requires libraries: pandas, python-docx, sqlparse, and openpyxl. 
+    - Requires libraries: pandas, pyarrow, python-docx, sqlparse, xlsxwriter, pyahocorasick and orjson. 
     - Install libraries with 'pip install -r requirements.txt'.
+    - The helpers in transformation_utils.py can optionally be compiled with mypyc, see README.
 
 Author: Eddie Davison
 Modified: Jan 2024
@@ -31,14 +32,21 @@ Modified: Jan 2024
 
 import pandas as pd
 import os
-import json
-import csv
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pac
 import logging
+import ahocorasick
+import xlsxwriter
 from docx import Document
-from docx.shared import Pt, RGBColor
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from sqlparse.tokens import Keyword, DML
 import time
+from concurrent.futures import ProcessPoolExecutor
+from transformation_utils import clean_dependency, find_all_dependencies, find_dependencies, sql_runs_xml
 
 # Configurable Variables
 INPUT_FILENAME = "transformations.csv"
@@ -51,45 +59,33 @@ input_file_path = os.path.join(PROJECT_DIRECTORY, INPUT_FILENAME)
 table_names_file_path = os.path.join(PROJECT_DIRECTORY, TABLE_NAMES_FILENAME)
 output_directory_path = os.path.join(PROJECT_DIRECTORY, OUTPUT_DIRNAME)
 
+# Columns of transformations.csv, in order
+TRANSFORMATION_COLUMNS = ['workflow_name', 'dataset_name', 'dataset_version', 'date_modified', 'transformation_sql']
+
+# Font sizes for the document title and the version and date modified lines
+TITLE_FONT_SIZE = Pt(20)
+DETAIL_FONT_SIZE = Pt(14)
+
 # Initialize Logger
 logging.basicConfig(level=logging.INFO, format='%(message)s')
-start_time = time.time()
 
 ## Functions
 
-def is_good_sql(transformation_sql):
+def is_good_sql(upper_transformation_sql):
     """
-    Check if the SQL transformation is valid.
+    Check which SQL transformations are valid.
 
     Args:
-    transformation_sql (str): The SQL transformation string to be validated.
+    upper_transformation_sql (pd.Series): The upper case SQL transformation strings to be validated.
 
     Returns:
-    bool: True if the transformation SQL contains key elements, False otherwise.
+    pd.Series: True where the transformation SQL contains key elements, False otherwise.
     """
     key_elements = ["SELECT", "FROM"]
-    return all(elem in transformation_sql.upper() for elem in key_elements)
-
-def find_all_dependencies(dataset_name, dependency_map, seen=None):
-    """
-    Recursively find all dependencies for a given dataset.
-
-    Args:
-    dataset_name (str): Name of the dataset to find dependencies for.
-    dependency_map (dict): Dictionary mapping datasets to their dependencies.
-    seen (set, optional): Set of already processed datasets. Defaults to None.
-
-    Returns:
-    set: A set of all dependencies for the given dataset.
-    """
-    if seen is None:
-        seen = set()
-
-    if dataset_name not in seen:
-        seen.add(dataset_name)
-        for dependent in dependency_map.get(dataset_name, []):
-            seen.update(find_all_dependencies(dependent, dependency_map, seen))
-    return seen
+    is_good = pd.Series(True, index=upper_transformation_sql.index)
+    for elem in key_elements:
+        is_good &= upper_transformation_sql.str.contains(elem, regex=False)
+    return is_good
 
 def export_dependencies_to_excel(data, output_path, workflow_data, dependency_type="full"):
     """
@@ -101,20 +97,30 @@ def export_dependencies_to_excel(data, output_path, workflow_data, dependency_ty
     workflow_data (dict): Dictionary containing workflow and dataset details.
     dependency_type (str): Type of dependencies to export ('full' or 'direct').
     """
-    data_list = []
+    # constant_memory streams each row to disk once written, so rows must be written in order
+    workbook = xlsxwriter.Workbook(output_path, {'constant_memory': True})
+    worksheet = workbook.add_worksheet()
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+
+    column_names = ['WORKFLOW_NAME', 'DATA_SET_MNEMONIC', 'DEPENDENCY']
+    worksheet.write_row(0, 0, column_names, header_format)
+
+    row = 1
     for dataset, dependencies in data.items():
         workflow_name = workflow_data.get(dataset, {}).get("workflow_name", "UNKNOWN")
         for dependency in dependencies:
-            data_list.append((workflow_name, dataset, dependency))
+            worksheet.write_row(row, 0, (workflow_name, dataset, dependency))
+            row += 1
 
-    column_names = ['WORKFLOW_NAME', 'DATA_SET_MNEMONIC', 'DEPENDENCY']
-    df = pd.DataFrame(data_list, columns=column_names)
-    df.to_excel(output_path, index=False, engine='openpyxl')
+    workbook.close()
 
 def highlight_sql(sql, paragraph):
     """
     Highlight SQL syntax in a Word document paragraph.
 
+    The runs are written as XML and parsed in one go, which avoids the overhead of
+    python-docx creating and styling each run individually.
+
     Args:
     sql (str): SQL query string to be highlighted.
     paragraph (docx.text.paragraph.Paragraph): Paragraph object from python-docx containing the transformaqtion SQL.
@@ -122,290 +128,219 @@ def highlight_sql(sql, paragraph):
     Returns:
     None
     """
-    
-    # SQL keywords
-    keywords = ["SELECT", "FROM", "WHERE", "DISTINCT", "AND", "OR", "IN", "NOT IN", 
-                "JOIN", "INNER", "LEFT", "RIGHT", "OUTER", "ON", "AS", "LIKE", "GROUP BY", "ORDER BY", 
-                "HAVING", "WITH", "EXCLUDE", "UNION", "INTERSECT", "EXCEPT", "CASE", 
-                "WHEN", "THEN", "ELSE", "END", "BETWEEN", "OVER", "PARTITION BY", "ROWS", "RANGE"]
-    
-    # Vertica keywords
-    keywords.extend([
-        "COPY", "MERGE", "ANALYZE", "COLLECT", "STATISTICS", "PROJECTION", 
-        "SEGMENTED", "UNSEGMENTED", "NODES", "REJECTMAX", "ENFORCELENGTH", 
-        "TIMEOUT", "LOCAL", "SYSDATE", "SYSTIME", "SYSTIMESTAMP", "CURRENT_DATE", 
-        "CURRENT_TIME", "CURRENT_TIMESTAMP", "INTERVAL", "LIMIT", "OFFSET", 
-        "OVERLAPS", "USING", "EXCLUSIVE", "SHARED", "EXPLAIN", "PLAN", "PROFILE"
-    ])
-
-    # SQL functions
-    functions = [
-        "COUNT", "SUM", "AVG", "MIN", "MAX", "ROUND", "UPPER", "LOWER", 
-        "LENGTH", "LTRIM", "RTRIM", "COALESCE", "CAST", "CONVERT", "CASE",
-        "APPROXIMATE_COUNT_DISTINCT", "TO_TIMESTAMP", "DATE_TRUNC", "CASEWHEN",
-        "CASE WHEN", "DECODE", "NVL", "NULLIF", "EXTRACT", "POSITION", "SUBSTRING", 
-        "WHEN", "CHAR_LENGTH", "OCTET_LENGTH", "TO_CHAR", "TO_NUMBER", "TRIM",
-        "LEAD", "LAG", "FIRST_VALUE", "LAST_VALUE", "DENSE_RANK", "NTILE", 
-        "PERCENT_RANK", "PERCENTILE_CONT", "PERCENTILE_DISC", "CUME_DIST", 
-        "RANK", "ROW_NUMBER", "STDDEV", "STDDEV_POP", "STDDEV_SAMP", 
-        "VARIANCE", "VAR_POP", "VAR_SAMP"
-    ]
-
-    # Vertica functions
-    functions.extend([
-        "APPROXIMATE_COUNT_DISTINCT", "APPROXIMATE_MEDIAN", "APPROXIMATE_PERCENTILE", 
-        "AUTO_INCREMENT", "BIT_COUNT", "BTRIM", "CURRENT_DATABASE", "CURRENT_SCHEMA", 
-        "CURRENT_USER", "DECODE", "ENCODE", "HEX", "INET_ATON", "INET_NTOA", 
-        "INITCAP", "ISNULL", "LPAD", "RPAD", "MD5", "RANDOM", "REGEXP_INSTR", 
-        "REGEXP_REPLACE", "REGEXP_SUBSTR", "REPLACE", "SPLIT_PART", "TO_DATE", 
-        "TO_TIMESTAMP_TZ", "TRANSLATE", "TRUNC", "BINARY", "BOOLEAN", "CHAR", 
-        "VARCHAR", "DATE", "TIMESTAMP", "TIMESTAMPTZ", "TIMESTAMP_LTZ", "TIME", 
-        "TIME_TZ", "TIME_LTZ", "INTERVAL_YEAR", "INTERVAL_MONTH", "INTERVAL_DAY", 
-        "INTERVAL_HOUR", "INTERVAL_MINUTE", "INTERVAL_SECOND", "FLOAT", "REAL", 
-        "NUMERIC", "INT", "INTEGER", "BIGINT", "SMALLINT", "TINYINT", "BYTEINT", 
-        "HLL_AGGREGATE", "HLL_COMBINE", "HLL_ESTIMATE", "HLL_SYNTHESIZE", "HLL_UNION_AGG",
-        "RANK", "DENSE_RANK", "PERCENT_RANK", "CUME_DIST", "NTILE", "ROW_NUMBER",
-        "LAG", "LEAD", "FIRST_VALUE", "LAST_VALUE", "LISTAGG", "STRING_AGG"
-    ])
-
-    # SQL operators
-    operators = ["=", "<", ">", "<=", ">=", "<>", "!=", "||", "+", "-", "*", "/", "%"]
-
-    # Split the SQL into tokens
-    tokens = sql.split(" ")
-    in_comment = False
-
-    # For each token, add it to the paragraph with the appropriate formatting
-    for i, token in enumerate(tokens):
-        run = paragraph.add_run(token + " ")
-        run.font.name = 'Arial'
-        run.font.size = Pt(10)
-
-        # Check if the current token is a comment
-        if token.startswith("--") or token.startswith("/*"):
-            in_comment = True
-
-        if in_comment:
-            run.font.color.rgb = RGBColor(128, 128, 128)  # Grey for comments
-            if '\n' in token or token.endswith("*/"):
-                in_comment = False
-            continue
-
-        # Check if the current token and the next token form a multi-word keyword
-        if i < len(tokens) - 1:
-            combined_token = f"{token} {tokens[i + 1]}"
-            if combined_token.upper() in keywords:
-                run.font.color.rgb = RGBColor(128, 0, 128)  # Purple for keywords
-                continue
-
-        # Apply formatting based on the token type
-        if token.upper() in keywords:
-            run.font.color.rgb = RGBColor(128, 0, 128)  # Purple for keywords
-        elif token.upper() in functions:
-            run.font.color.rgb = RGBColor(0, 128, 0)    # Green for functions
-        elif any(op in token for op in operators):
-            run.font.color.rgb = RGBColor(255, 0, 0)    # Red for operators
-
-def clean_dependency(value):
+    runs = parse_xml(f'<w:p {nsdecls("w")}>{sql_runs_xml(sql)}</w:p>')
+    paragraph._p.extend(list(runs))
+
+def build_dataset_automaton(dataset_names):
     """
-    Check if a dependency value is clean (non-empty and not just whitespace).
+    Build an Aho-Corasick automaton that matches any of the given dataset names.
 
     Args:
-    value (str): The dependency string to be checked.
+    dataset_names (set): Upper case dataset names to search for in transformation SQL.
 
     Returns:
-    bool: True if the value is clean, False otherwise.
+    ahocorasick.Automaton: Automaton whose matches yield the dataset name that was found.
+    """
+    automaton = ahocorasick.Automaton()
+    for name in dataset_names:
+        if clean_dependency(name):
+            automaton.add_word(name, name)
+    automaton.make_automaton()
+    return automaton
+
+def build_doc(args):
     """
-    return value.strip() not in ["", "\t", "\t\t\t", "CATEGORY"]
+    Create and save the Word document for a single dataset.
 
-## Main Process Flow
-"""
-1. Create Output Directory if it doesn't exist.
-2. Create a dictionary to store transformations for each workflow and dataset in the CSV file.
-3. Extract columns from CSV and create folders for each workflow name.
-4. Store transformation SQL in the workflow_transformations dictionary.
-5. Extract unique data_set_mnemonics.
-6. Read the additional table names from table_names.csv.
-7. Combine the unique datasets with the additional table names.
-8. Find dependencies for each dataset and store in a dictionary.
-9. Save dependencies to JSON.
-10. Trace all dependencies recursively.
-11. Save full dependencies to JSON.
-12. Prepare workflow_data dictionary.
-13. Export direct dependencies to Excel.
-14. Export full dependencies to Excel.
-15. Create a Word document for each dataset.
-16. Save the Word document to the appropriate workflow directory.
-"""
+    Args:
+    args (tuple): Workflow name, dataset name, dataset version, date modified, transformation SQL,
+        direct dependencies, full dependencies and the output directory path.
 
-# Create output directory if it doesn't exist
-if not os.path.exists(output_directory_path):
-    os.makedirs(output_directory_path)
-
-# Create a dictionary to store transformations for each workflow and dataset in the CSV file
-workflow_transformations = {}
-
-# Extract workflow name, dataset name, dataset version, date modified, and transformation SQL
-with open(input_file_path, 'r', encoding='utf-8') as csvfile:
-    csvreader = csv.reader(csvfile)
-    headers = next(csvreader)
-    for row in csvreader:
-        workflow_name, dataset_name, dataset_version, date_modified, transformation_sql = row
-        if is_good_sql(transformation_sql):
-            # Define the directory path for the current workflow
-            workflow_dir = os.path.join(output_directory_path, workflow_name)
-            
-            # Create the workflow directory if it doesn't exist
-            if not os.path.exists(workflow_dir):
-                os.makedirs(workflow_dir)
-            
-            # Store transformation SQL in the workflow_transformations dictionary
-            if workflow_name not in workflow_transformations:
-                workflow_transformations[workflow_name] = {}
-            if dataset_name not in workflow_transformations[workflow_name]:
-                workflow_transformations[workflow_name][dataset_name] = {'version': dataset_version, 'date_modified': date_modified, 'sqls': []}
-                
-            workflow_transformations[workflow_name][dataset_name]['sqls'].append(transformation_sql)
-
-# Extract unique data_set_mnemonics
-unique_data_sets = set()
-with open(input_file_path, 'r', encoding='utf-8') as csvfile:
-    csvreader = csv.reader(csvfile)
-    headers = next(csvreader)
-    for row in csvreader:
-        _, dataset_name, _, _, _ = row
-        unique_data_sets.add(dataset_name.upper())  # Storing in upper case
-
-# Read the additional table names from table_names.csv
-additional_table_names = set()
-with open(table_names_file_path, 'r', encoding='utf-8') as csvfile:
-    csvreader = csv.reader(csvfile)
-    headers = next(csvreader)
-    for row in csvreader:
-        additional_table_names.add(row[0].upper())  # Storing in upper case
-
-# Combine the unique datasets with the additional table names
-unique_data_sets = unique_data_sets.union(additional_table_names)
-
-# Find dependencies for each dataset and store in a dictionary
-dataset_dependencies = {}
-
-# For each dataset, trace all dependencies
-for workflow, datasets in workflow_transformations.items():
-    for dataset, details in datasets.items():
-        dependencies = set()
-        for transformation in details['sqls']:
-            upper_transformation = transformation.upper()
-            for potential_dependency in unique_data_sets:
-                # Check if our potential_dependency appears in the transformation
-                if potential_dependency in upper_transformation:
-                    if clean_dependency(potential_dependency):
-                        dependencies.add(potential_dependency)
-        dataset_dependencies[dataset] = list(dependencies)
-
-logging.info(f"Identified dependencies for {len(dataset_dependencies)} datasets.")
-
-# Save dependencies to JSON
-dependencies_filepath = os.path.join(output_directory_path, "direct_dependencies.json")
-with open(dependencies_filepath, 'w') as json_file:
-    json.dump(dataset_dependencies, json_file, indent=4)
-
-# Trace all dependencies recursively
-full_dependencies = {}
-for dataset in dataset_dependencies.keys():
-    full_dependencies[dataset] = list(find_all_dependencies(dataset, dataset_dependencies))
-    full_dependencies[dataset].remove(dataset)  # Remove self from dependencies
-
-# Save full dependencies to JSON
-full_dependencies_filepath = os.path.join(output_directory_path, "full_dataset_dependencies.json")
-with open(full_dependencies_filepath, 'w') as json_file:
-    json.dump(full_dependencies, json_file, indent=4)
-
-# Prepare workflow_data dictionary
-workflow_data = {}
-for workflow, datasets in workflow_transformations.items():
-    for dataset in datasets:
-        workflow_data[dataset] = {"workflow_name": workflow}
-
-# Export direct dependencies to Excel
-direct_dependencies_path = os.path.join(output_directory_path, "direct_dependencies.xlsx")
-export_dependencies_to_excel(dataset_dependencies, direct_dependencies_path, workflow_data, dependency_type="direct")
-logging.info(f"Exported direct dependencies to {direct_dependencies_path}")
-
-# Export full dependencies to Excel
-full_dependencies_path = os.path.join(output_directory_path, "full_dependencies.xlsx")
-export_dependencies_to_excel(full_dependencies, full_dependencies_path, workflow_data, dependency_type="full")
-logging.info(f"Exported full dependencies to {full_dependencies_path}")
-
-# Initialize counter
-word_file_count = 0
-
-# Create a Word document for each dataset
-for workflow, datasets in workflow_transformations.items():
-    logging.info(f"Processing workflow: {workflow}")
-    for dataset, details in datasets.items():
-        doc = Document()
-        # Add title
-        title = doc.add_heading(dataset, 0)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        for run in title.runs:
-            run.font.name = 'Arial'
-            run.font.size = Pt(20)
-            run.font.bold = True
-
-         # Add version number
-        version_paragraph = doc.add_paragraph(f"Version: {details['version']}")
-        for run in version_paragraph.runs:
-            run.font.name = 'Arial'
-            run.font.size = Pt(14)
-            run.font.bold = True
-
-        # Add date modified
-        date_modified_paragraph = doc.add_paragraph(f"Date Modified: {details['date_modified']}")
-        for run in date_modified_paragraph.runs:
-            run.font.name = 'Arial'
-            run.font.size = Pt(14)
-            run.font.bold = True
-        
-        # Add each transformation
-        for i, transformation in enumerate(details['sqls']):
-            heading = doc.add_heading(f'Transformation {i+1}', level=1)
-            paragraph = doc.add_paragraph()
-            # Highlight the SQL syntax
-            highlight_sql(transformation, paragraph)
-
-        # Add list of Direct Dependencies
-        direct_deps = dataset_dependencies.get(dataset, [])
-        direct_deps_paragraph = doc.add_paragraph()
-        direct_deps_paragraph.add_run(f"Direct Dependencies: {len(direct_deps)}\n").bold = True
-        for dep in direct_deps:
-            direct_deps_paragraph.add_run(dep + "\n")
-
-        # Add list of Full Dependencies
-        full_deps = full_dependencies.get(dataset, [])
-        full_deps_paragraph = doc.add_paragraph()
-        full_deps_paragraph.add_run(f"Full Dependencies: {len(full_deps)}\n").bold = True
-        for dep in full_deps:
-            full_deps_paragraph.add_run(dep + "\n")
-
-        output_file = os.path.join(output_directory_path, workflow, f"{dataset}.docx")
-        doc.save(output_file)
-        # Increment the counter
-        word_file_count += 1
-        logging.info(f"Saved document for dataset {dataset} at {output_file}")
-
-end_time = time.time()
-elapsed_time = end_time - start_time
-minutes = int(elapsed_time // 60)
-seconds = int(elapsed_time % 60)
-
-if minutes == 1:
-    logging.info(f"Done! Created {word_file_count} word documents, 2 JSON files and 2 Excel Workbooks in 1 minute and {seconds} seconds")
-elif minutes > 1:
-    logging.info(f"Done! Created {word_file_count} word documents, 2 JSON files and 2 Excel Workbooks in {minutes} minutes and {seconds} seconds")
-else:
-    logging.info(f"Done! Created {word_file_count} word documents, 2 JSON files and 2 Excel Workbooks in {seconds} seconds")
+    Returns:
+    str: Path of the saved Word document.
+    """
+    workflow, dataset, version, date_modified, sqls, direct_deps, full_deps, out_dir = args
 
+    doc = Document()
+    # Add title
+    title = doc.add_heading(dataset, 0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for run in title.runs:
+        run.font.name = 'Arial'
+        run.font.size = TITLE_FONT_SIZE
+        run.font.bold = True
 
+    # Add version number
+    version_paragraph = doc.add_paragraph(f"Version: {version}")
+    for run in version_paragraph.runs:
+        run.font.name = 'Arial'
+        run.font.size = DETAIL_FONT_SIZE
+        run.font.bold = True
 
+    # Add date modified
+    date_modified_paragraph = doc.add_paragraph(f"Date Modified: {date_modified}")
+    for run in date_modified_paragraph.runs:
+        run.font.name = 'Arial'
+        run.font.size = DETAIL_FONT_SIZE
+        run.font.bold = True
+
+    # Add each transformation
+    for i, transformation in enumerate(sqls):
+        heading = doc.add_heading(f'Transformation {i+1}', level=1)
+        paragraph = doc.add_paragraph()
+        # Highlight the SQL syntax
+        highlight_sql(transformation, paragraph)
+
+    # Add list of Direct Dependencies
+    direct_deps_paragraph = doc.add_paragraph()
+    direct_deps_paragraph.add_run(f"Direct Dependencies: {len(direct_deps)}\n").bold = True
+    direct_deps_paragraph.add_run("\n".join(direct_deps))
+
+    # Add list of Full Dependencies
+    full_deps_paragraph = doc.add_paragraph()
+    full_deps_paragraph.add_run(f"Full Dependencies: {len(full_deps)}\n").bold = True
+    full_deps_paragraph.add_run("\n".join(full_deps))
+
+    output_file = os.path.join(out_dir, workflow, f"{dataset}.docx")
+    doc.save(output_file)
+    logging.info(f"Saved document for dataset {dataset} at {output_file}")
+    return output_file
 
+## Main Process Flow
+
+def main():
+    """
+    Main process flow.
+
+    1. Create Output Directory if it doesn't exist.
+    2. Read the CSV file into a DataFrame.
+    3. Group transformation SQL by workflow and dataset into the grouped_transformations DataFrame, joining the upper case SQL of each dataset.
+    4. Create folders for each workflow name.
+    5. Extract unique data_set_mnemonics.
+    6. Read the additional table names from table_names.csv.
+    7. Combine the unique datasets with the additional table names.
+    8. Find dependencies for each dataset and store in a dictionary.
+    9. Trace all dependencies recursively.
+    10. Start creating a Word document for each dataset in worker processes, saved to the appropriate workflow directory.
+    11. Save dependencies to JSON.
+    12. Save full dependencies to JSON.
+    13. Prepare workflow_data dictionary.
+    14. Export direct dependencies to Excel.
+    15. Export full dependencies to Excel.
+    16. Wait for the Word documents to be saved.
+    """
+    start_time = time.time()
+
+    # Create output directory if it doesn't exist
+    os.makedirs(output_directory_path, exist_ok=True)
+
+    # Read the CSV once with Arrow; every column is kept as text, empty cells stay as empty strings and SQL may span lines
+    transformations = pac.read_csv(
+        input_file_path,
+        read_options=pac.ReadOptions(column_names=TRANSFORMATION_COLUMNS, skip_rows=1, block_size=8 << 20),
+        parse_options=pac.ParseOptions(newlines_in_values=True),
+        convert_options=pac.ConvertOptions(column_types={column: pa.string() for column in TRANSFORMATION_COLUMNS}),
+    ).to_pandas(types_mapper=pd.ArrowDtype)
+
+    # Upper case each SQL once, for both the validity check and the dependency search
+    transformations['upper_transformation_sql'] = transformations['transformation_sql'].str.upper()
+
+    # Keep rows of the same workflow together, in order of first appearance, so the groups below are ordered by workflow
+    good_transformations = transformations[is_good_sql(transformations['upper_transformation_sql'])]
+    workflow_order = pd.factorize(good_transformations['workflow_name'])[0]
+    good_transformations = good_transformations.iloc[workflow_order.argsort(kind='stable')]
+
+    # Group the transformation SQL by workflow and dataset, keeping the version and date modified of the first row
+    grouped_transformations = good_transformations.groupby(['workflow_name', 'dataset_name'], sort=False).agg(
+        version=('dataset_version', 'first'),
+        date_modified=('date_modified', 'first'),
+        sqls=('transformation_sql', list),
+        upper_sql=('upper_transformation_sql', '\n'.join),
+    )
+
+    # Create a folder for each workflow
+    for workflow_name in grouped_transformations.index.unique(level='workflow_name'):
+        os.makedirs(os.path.join(output_directory_path, workflow_name), exist_ok=True)
+
+    # Extract unique data_set_mnemonics
+    unique_data_sets = set(transformations['dataset_name'].str.upper())  # Storing in upper case
+
+    # Read the additional table names from the first column of table_names.csv
+    # The header row is read as data and sliced off, so a file with no table names still has a row to parse
+    # and the first column is always read as text
+    table_names = pac.read_csv(
+        table_names_file_path,
+        read_options=pac.ReadOptions(autogenerate_column_names=True),
+        parse_options=pac.ParseOptions(newlines_in_values=True),
+        convert_options=pac.ConvertOptions(column_types={'f0': pa.string()}),
+    ).column(0).slice(1)
+    additional_table_names = set(pc.utf8_upper(table_names).to_pylist())  # Storing in upper case
+
+    # Combine the unique datasets with the additional table names
+    unique_data_sets = unique_data_sets.union(additional_table_names)
+
+    # Build an Aho-Corasick automaton so every dataset name is matched in a single pass over the SQL
+    dataset_automaton = build_dataset_automaton(unique_data_sets)
+
+    # Find dependencies for each dataset, scanning its joined upper case SQL once, and store in a dictionary
+    found_dependencies = grouped_transformations['upper_sql'].map(lambda upper_sql: find_dependencies(upper_sql, dataset_automaton))
+    dataset_dependencies = dict(zip(found_dependencies.index.get_level_values('dataset_name'), found_dependencies))
+
+    logging.info(f"Identified dependencies for {len(dataset_dependencies)} datasets.")
+
+    # Trace all dependencies recursively
+    full_dependencies = find_all_dependencies(dataset_dependencies)
+
+    # Create a Word document for each dataset, in parallel across processes
+    tasks = []
+    for (workflow, dataset), version, date_modified, sqls, _ in grouped_transformations.itertuples(name=None):
+        tasks.append((workflow, dataset, version, date_modified, sqls,
+                      dataset_dependencies.get(dataset, []), full_dependencies.get(dataset, []),
+                      output_directory_path))
+    logging.info(f"Creating {len(tasks)} Word documents")
+
+    with ProcessPoolExecutor() as executor:
+        # All documents are submitted straight away, so the JSON and Excel exports below run while they are built
+        saved_documents = executor.map(build_doc, tasks, chunksize=8)
+
+        # Save dependencies to JSON
+        dependencies_filepath = os.path.join(output_directory_path, "direct_dependencies.json")
+        with open(dependencies_filepath, 'wb') as json_file:
+            json_file.write(orjson.dumps(dataset_dependencies, option=orjson.OPT_INDENT_2))
+
+        # Save full dependencies to JSON
+        full_dependencies_filepath = os.path.join(output_directory_path, "full_dataset_dependencies.json")
+        with open(full_dependencies_filepath, 'wb') as json_file:
+            json_file.write(orjson.dumps(full_dependencies, option=orjson.OPT_INDENT_2))
+
+        # Prepare workflow_data dictionary
+        workflow_data = {dataset: {"workflow_name": workflow} for workflow, dataset in grouped_transformations.index}
+
+        # Export direct dependencies to Excel
+        direct_dependencies_path = os.path.join(output_directory_path, "direct_dependencies.xlsx")
+        export_dependencies_to_excel(dataset_dependencies, direct_dependencies_path, workflow_data, dependency_type="direct")
+        logging.info(f"Exported direct dependencies to {direct_dependencies_path}")
+
+        # Export full dependencies to Excel
+        full_dependencies_path = os.path.join(output_directory_path, "full_dependencies.xlsx")
+        export_dependencies_to_excel(full_dependencies, full_dependencies_path, workflow_data, dependency_type="full")
+        logging.info(f"Exported full dependencies to {full_dependencies_path}")
+
+        # Wait for the Word documents to be saved
+        word_file_count = len(list(saved_documents))
+
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    minutes = int(elapsed_time // 60)
+    seconds = int(elapsed_time % 60)
+
+    if minutes == 1:
+        logging.info(f"Done! Created {word_file_count} word documents, 2 JSON files and 2 Excel Workbooks in 1 minute and {seconds} seconds")
+    elif minutes > 1:
+        logging.info(f"Done! Created {word_file_count} word documents, 2 JSON files and 2 Excel Workbooks in {minutes} minutes and {seconds} seconds")
+    else:
+        logging.info(f"Done! Created {word_file_count} word documents, 2 JSON files and 2 Excel Workbooks in {seconds} seconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Helpers for the hot paths of the HealtheIntent Transformation Exporter: dependency tracing and SQL highlighting.
+
+These are kept apart from main.py, with type annotations, so that they can optionally be compiled with mypyc
+(see README). When no compiled module is present the pure Python version in this file is imported instead.
+"""
+
+import re
+from typing import Any, Optional
+from xml.sax.saxutils import escape
+
+from sqlparse.lexer import tokenize
+from sqlparse.tokens import Comment, Keyword, Name, Operator, Whitespace, Wildcard
+
+# SQL keywords, including Vertica keywords
+KEYWORDS = frozenset([
+    "SELECT", "FROM", "WHERE", "DISTINCT", "AND", "OR", "IN", "NOT IN",
+    "JOIN", "INNER", "LEFT", "RIGHT", "OUTER", "ON", "AS", "LIKE", "GROUP BY", "ORDER BY",
+    "HAVING", "WITH", "EXCLUDE", "UNION", "INTERSECT", "EXCEPT", "CASE",
+    "WHEN", "THEN", "ELSE", "END", "BETWEEN", "OVER", "PARTITION BY", "ROWS", "RANGE",
+    "COPY", "MERGE", "ANALYZE", "COLLECT", "STATISTICS", "PROJECTION",
+    "SEGMENTED", "UNSEGMENTED", "NODES", "REJECTMAX", "ENFORCELENGTH",
+    "TIMEOUT", "LOCAL", "SYSDATE", "SYSTIME", "SYSTIMESTAMP", "CURRENT_DATE",
+    "CURRENT_TIME", "CURRENT_TIMESTAMP", "INTERVAL", "LIMIT", "OFFSET",
+    "OVERLAPS", "USING", "EXCLUSIVE", "SHARED", "EXPLAIN", "PLAN", "PROFILE"
+])
+
+# SQL functions, including Vertica functions and data types
+FUNCTIONS = frozenset([
+    "COUNT", "SUM", "AVG", "MIN", "MAX", "ROUND", "UPPER", "LOWER",
+    "LENGTH", "LTRIM", "RTRIM", "COALESCE", "CAST", "CONVERT", "CASE",
+    "APPROXIMATE_COUNT_DISTINCT", "TO_TIMESTAMP", "DATE_TRUNC", "CASEWHEN",
+    "CASE WHEN", "DECODE", "NVL", "NULLIF", "EXTRACT", "POSITION", "SUBSTRING",
+    "WHEN", "CHAR_LENGTH", "OCTET_LENGTH", "TO_CHAR", "TO_NUMBER", "TRIM",
+    "LEAD", "LAG", "FIRST_VALUE", "LAST_VALUE", "DENSE_RANK", "NTILE",
+    "PERCENT_RANK", "PERCENTILE_CONT", "PERCENTILE_DISC", "CUME_DIST",
+    "RANK", "ROW_NUMBER", "STDDEV", "STDDEV_POP", "STDDEV_SAMP",
+    "VARIANCE", "VAR_POP", "VAR_SAMP",
+    "APPROXIMATE_MEDIAN", "APPROXIMATE_PERCENTILE",
+    "AUTO_INCREMENT", "BIT_COUNT", "BTRIM", "CURRENT_DATABASE", "CURRENT_SCHEMA",
+    "CURRENT_USER", "ENCODE", "HEX", "INET_ATON", "INET_NTOA",
+    "INITCAP", "ISNULL", "LPAD", "RPAD", "MD5", "RANDOM", "REGEXP_INSTR",
+    "REGEXP_REPLACE", "REGEXP_SUBSTR", "REPLACE", "SPLIT_PART", "TO_DATE",
+    "TO_TIMESTAMP_TZ", "TRANSLATE", "TRUNC", "BINARY", "BOOLEAN", "CHAR",
+    "VARCHAR", "DATE", "TIMESTAMP", "TIMESTAMPTZ", "TIMESTAMP_LTZ", "TIME",
+    "TIME_TZ", "TIME_LTZ", "INTERVAL_YEAR", "INTERVAL_MONTH", "INTERVAL_DAY",
+    "INTERVAL_HOUR", "INTERVAL_MINUTE", "INTERVAL_SECOND", "FLOAT", "REAL",
+    "NUMERIC", "INT", "INTEGER", "BIGINT", "SMALLINT", "TINYINT", "BYTEINT",
+    "HLL_AGGREGATE", "HLL_COMBINE", "HLL_ESTIMATE", "HLL_SYNTHESIZE", "HLL_UNION_AGG",
+    "LISTAGG", "STRING_AGG"
+])
+
+# Names in both sets are highlighted as keywords, so lexer keywords only need checking against the rest
+FUNCTIONS_NOT_KEYWORDS = FUNCTIONS - KEYWORDS
+
+# Characters that Word stores as separate elements rather than as run text
+RUN_BREAK_PATTERN = re.compile(r"(\r\n|[\r\n\t])")
+
+## Functions
+
+def clean_dependency(value: str) -> bool:
+    """
+    Check if a dependency value is clean (non-empty and not just whitespace).
+
+    Args:
+    value (str): The dependency string to be checked.
+
+    Returns:
+    bool: True if the value is clean, False otherwise.
+    """
+    return value.strip() not in ["", "\t", "\t\t\t", "CATEGORY"]
+
+def find_dependencies(upper_sql: str, automaton: Any) -> list[str]:
+    """
+    Find the datasets referenced in a transformation's SQL.
+
+    Args:
+    upper_sql (str): Upper case SQL to search.
+    automaton (ahocorasick.Automaton): Automaton built by build_dataset_automaton in main.py.
+
+    Returns:
+    list: Unique dataset names found in the SQL.
+    """
+    return list({name for _, name in automaton.iter(upper_sql)})
+
+def find_all_dependencies(dependency_map: dict[str, list[str]]) -> dict[str, list[str]]:
+    """
+    Find all direct and indirect dependencies for every dataset in the dependency map.
+
+    Strongly connected components are found with an iterative Tarjan's algorithm, which
+    completes them in reverse topological order. Each component's closure is then the
+    union of its members and the closures of the components it points to, so every part
+    of the graph is traversed once. Dataset names are interned to sorted integer indexes and
+    closures are held as integer bitmasks over those indexes.
+
+    Args:
+    dependency_map (dict): Dictionary mapping datasets to their direct dependencies.
+
+    Returns:
+    dict: Dictionary mapping each dataset to a sorted list of all its dependencies, excluding itself.
+    """
+    names = sorted(set(dependency_map).union(*dependency_map.values()))
+    index = {name: i for i, name in enumerate(names)}
+    successors = [[index[dependency] for dependency in dependency_map.get(name, [])] for name in names]
+
+    node_count = len(names)
+    order = [-1] * node_count
+    low_link = [0] * node_count
+    on_stack = [False] * node_count
+    stack: list[int] = []
+    closures = [0] * node_count
+    counter = 0
+
+    for root in range(node_count):
+        if order[root] != -1:
+            continue
+        order[root] = low_link[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, 0)]
+
+        while work:
+            node, position = work[-1]
+            if position < len(successors[node]):
+                work[-1] = (node, position + 1)
+                successor = successors[node][position]
+                if order[successor] == -1:
+                    order[successor] = low_link[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack[successor] = True
+                    work.append((successor, 0))
+                elif on_stack[successor]:
+                    low_link[node] = min(low_link[node], order[successor])
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low_link[parent] = min(low_link[parent], low_link[node])
+
+            if low_link[node] == order[node]:
+                # Pop the completed component; every component it points to is already closed
+                members: list[int] = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    members.append(member)
+                    if member == node:
+                        break
+                closure = 0
+                for member in members:
+                    closure |= 1 << member
+                    for successor in successors[member]:
+                        closure |= closures[successor]
+                for member in members:
+                    closures[member] = closure
+
+    full_dependencies: dict[str, list[str]] = {}
+    for name in dependency_map:
+        i = index[name]
+        closure = closures[i] ^ (1 << i)  # Remove self from dependencies, every closure includes its own bit
+        # Visit only the set bits, lowest first, so the names come out in sorted order
+        dependencies: list[str] = []
+        while closure:
+            lowest_bit = closure & -closure
+            dependencies.append(names[lowest_bit.bit_length() - 1])
+            closure ^= lowest_bit
+        full_dependencies[name] = dependencies
+    return full_dependencies
+
+def sql_run_properties(color: Optional[str] = None) -> str:
+    """
+    Build the run properties XML for a run of highlighted SQL.
+
+    Args:
+    color (str, optional): Hex RGB colour for the run. Defaults to None for no colour.
+
+    Returns:
+    str: A <w:rPr> element setting Arial 10pt and the given colour.
+    """
+    color_xml = f'<w:color w:val="{color}"/>' if color else ""
+    return f'<w:rPr><w:rFonts w:ascii="Arial" w:hAnsi="Arial"/>{color_xml}<w:sz w:val="20"/></w:rPr>'
+
+SQL_DEFAULT_PROPERTIES = sql_run_properties()
+SQL_KEYWORD_PROPERTIES = sql_run_properties("800080")   # Purple for keywords
+SQL_FUNCTION_PROPERTIES = sql_run_properties("008000")  # Green for functions
+SQL_OPERATOR_PROPERTIES = sql_run_properties("FF0000")  # Red for operators
+SQL_COMMENT_PROPERTIES = sql_run_properties("808080")   # Grey for comments
+
+def sql_token_properties(ttype: Any, value: str) -> str:
+    """
+    Determine the run properties for a lexed SQL token.
+
+    Args:
+    ttype (sqlparse.tokens._TokenType): Token type assigned by the sqlparse lexer.
+    value (str): Text of the token.
+
+    Returns:
+    str: One of the precomputed SQL run properties fragments.
+    """
+    if ttype in Comment:
+        return SQL_COMMENT_PROPERTIES
+    if ttype in Operator or ttype in Wildcard:
+        return SQL_OPERATOR_PROPERTIES
+    if ttype in Name.Builtin:
+        return SQL_FUNCTION_PROPERTIES
+    if ttype in Keyword:
+        if value.upper() in FUNCTIONS_NOT_KEYWORDS:
+            return SQL_FUNCTION_PROPERTIES
+        return SQL_KEYWORD_PROPERTIES
+    if ttype in Name and value.upper() in FUNCTIONS:
+        return SQL_FUNCTION_PROPERTIES
+    return SQL_DEFAULT_PROPERTIES
+
+def run_text_xml(text: str) -> str:
+    """
+    Convert run text to Word XML, turning line breaks and tabs into their own elements.
+
+    Args:
+    text (str): Text of the run.
+
+    Returns:
+    str: Sequence of <w:t>, <w:br/> and <w:tab/> elements.
+    """
+    xml: list[str] = []
+    for piece in RUN_BREAK_PATTERN.split(text):
+        if piece == "\t":
+            xml.append("<w:tab/>")
+        elif piece in ("\r\n", "\r", "\n"):
+            xml.append("<w:br/>")
+        elif piece:
+            xml.append(f'<w:t xml:space="preserve">{escape(piece)}</w:t>')
+    return "".join(xml)
+
+def sql_runs_xml(sql: str) -> str:
+    """
+    Build the Word XML runs for SQL with syntax highlighting.
+
+    Args:
+    sql (str): SQL query string to be highlighted.
+
+    Returns:
+    str: Sequence of <w:r> elements, one per group of consecutive tokens with the same formatting.
+    """
+    # Group consecutive tokens with the same formatting into one run, whitespace joins whichever run it follows
+    segments: list[tuple[list[str], str]] = []
+    for ttype, value in tokenize(sql):
+        if ttype in Whitespace:
+            properties = segments[-1][1] if segments else SQL_DEFAULT_PROPERTIES
+        else:
+            properties = sql_token_properties(ttype, value)
+        if segments and segments[-1][1] == properties:
+            segments[-1][0].append(value)
+        else:
+            segments.append(([value], properties))
+
+    return "".join(f"<w:r>{properties}{run_text_xml(''.join(values))}</w:r>" for values, properties in segments)